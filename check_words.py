@@ -1,81 +1,384 @@
 #!/usr/bin/env python3
 """
 Utility script to check and preview words database
+
+Per-entry checks (Markdown, message length, transcription rules) run in a
+process pool and are cached by entry hash, so reruns only recheck entries
+that changed. Pack-wide checks (duplicates, id order, near-duplicates)
+always run over the whole pack.
 """
 
+import argparse
+import hashlib
 import json
-from collections import Counter
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+
+from formatting import format_word_message, TELEGRAM_MESSAGE_LIMIT
+
+# Bump when per-entry checks change so cached results are invalidated
+VALIDATOR_VERSION = 2
+
+CACHE_FILE = '.check_words_cache.json'
+
+# Words at least this similar (0..1) are reported as near-duplicates
+NEAR_DUPLICATE_RATIO = 0.85
+
+# Transcriptions use lowercase Latin letters, spaces, hyphens and apostrophes
+TRANSCRIPTION_PATTERN = re.compile(r"[a-z' \-]+")
+
+# Polish spellings that must be rewritten in transcriptions
+POLISH_DIGRAPHS = {'sz': 'sh', 'cz': 'ch', 'rz': 'zh/sh'}
+
+MARKDOWN_FIELDS = ('word', 'translation', 'description', 'fun_fact', 'transcription')
+
+REQUIRED_FIELDS = ('word', 'translation', 'description')
+
+
+def find_markdown_error(text: str) -> str:
+    """Return description of the first legacy Markdown error, or empty string"""
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        
+        if ch == '\\':
+            i += 2
+            continue
+        
+        if text.startswith('```', i):
+            close = text.find('```', i + 3)
+            if close == -1:
+                return f"unclosed ``` at position {i}"
+            i = close + 3
+        elif ch in '*_`':
+            close = text.find(ch, i + 1)
+            if close == -1:
+                return f"unclosed '{ch}' at position {i}"
+            i = close + 1
+        elif ch == '[':
+            close = text.find(']', i + 1)
+            if close == -1:
+                return f"unclosed '[' at position {i}"
+            if text.startswith('(', close + 1) and text.find(')', close + 2) == -1:
+                return f"unclosed link URL at position {close + 1}"
+            i = close + 1
+        else:
+            i += 1
+    
+    return ""
+
+
+def check_transcription(transcription: str) -> list:
+    """Check transcription against the Polish→Latin rules"""
+    issues = []
+    
+    if not TRANSCRIPTION_PATTERN.fullmatch(transcription):
+        bad_chars = sorted(set(re.sub(r"[a-z' \-]", '', transcription)))
+        issues.append(['error', f"transcription has invalid characters: {''.join(bad_chars)}"])
+    
+    for digraph, replacement in POLISH_DIGRAPHS.items():
+        if digraph in transcription:
+            issues.append(['warning', f"transcription contains Polish '{digraph}' (use '{replacement}')"])
+    
+    return issues
+
+
+def is_renderable(word) -> bool:
+    """Check that entry has the shape format_word_message expects"""
+    if not isinstance(word, dict):
+        return False
+    
+    if not all(isinstance(word.get(field), str) and word[field] for field in REQUIRED_FIELDS):
+        return False
+    
+    if any(word.get(field) is not None and not isinstance(word[field], str)
+           for field in MARKDOWN_FIELDS):
+        return False
+    
+    examples = word.get('examples', [])
+    return isinstance(examples, list) and all(isinstance(e, str) for e in examples)
+
+
+def validate_entry(word: dict) -> list:
+    """Run all per-entry checks. Returns list of [level, message] pairs."""
+    issues = []
+    
+    if not isinstance(word, dict):
+        return [['error', "entry must be an object"]]
+    
+    for field in REQUIRED_FIELDS:
+        if not word.get(field):
+            issues.append(['error', f"missing '{field}'"])
+    
+    for field in MARKDOWN_FIELDS:
+        if word.get(field) is not None and not isinstance(word[field], str):
+            issues.append(['error', f"'{field}' must be a string"])
+    
+    examples = word.get('examples', [])
+    if not isinstance(examples, list):
+        issues.append(['error', "'examples' must be a list"])
+    else:
+        for n, example in enumerate(examples):
+            if not isinstance(example, str):
+                issues.append(['error', f"'examples[{n}]' must be a string"])
+    
+    # Remaining checks need a well-formed entry
+    if issues:
+        return issues
+    
+    # Markdown of individual fields, so the error points to the right place
+    for field in MARKDOWN_FIELDS:
+        error = find_markdown_error(word.get(field) or '')
+        if error:
+            issues.append(['error', f"Markdown in '{field}': {error}"])
+    
+    for n, example in enumerate(word.get('examples', [])):
+        error = find_markdown_error(example)
+        if error:
+            issues.append(['error', f"Markdown in 'examples[{n}]': {error}"])
+    
+    message = format_word_message(word)
+    
+    # Fields may be valid alone but break when joined together
+    if not issues:
+        error = find_markdown_error(message)
+        if error:
+            issues.append(['error', f"Markdown in rendered message: {error}"])
+    
+    if len(message) > TELEGRAM_MESSAGE_LIMIT:
+        issues.append(['error', f"rendered message is {len(message)} chars (limit {TELEGRAM_MESSAGE_LIMIT})"])
+    
+    if word.get('transcription'):
+        issues.extend(check_transcription(word['transcription']))
+    else:
+        issues.append(['warning', "missing transcription"])
+    
+    return issues
+
+
+def entry_hash(word: dict) -> str:
+    """Stable hash of entry content and validator version"""
+    payload = json.dumps(word, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{VALIDATOR_VERSION}:{payload}".encode('utf-8')).hexdigest()
+
+
+def load_cache(path: str) -> dict:
+    """Load cached per-entry results, keyed by entry hash"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    
+    if cache.get('version') != VALIDATOR_VERSION:
+        return {}
+    return cache.get('entries', {})
+
+
+def save_cache(path: str, entries: dict):
+    """Save per-entry results (only hashes of the current pack are kept)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': VALIDATOR_VERSION, 'entries': entries}, f, ensure_ascii=False)
+
+
+def validate_entries(words: list, cache: dict, workers: int = None) -> tuple:
+    """
+    Validate entries in parallel, skipping cached ones.
+    Returns (issues per entry, results by hash, number of rechecked entries).
+    """
+    hashes = [entry_hash(word) for word in words]
+    pending = [i for i, h in enumerate(hashes) if h not in cache]
+    
+    results = {h: cache[h] for h in hashes if h in cache}
+    
+    if pending:
+        pending_words = [words[i] for i in pending]
+        chunksize = max(1, len(pending_words) // ((workers or os.cpu_count() or 1) * 4))
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            issues = executor.map(validate_entry, pending_words, chunksize=chunksize)
+            for i, entry_issues in zip(pending, issues):
+                results[hashes[i]] = entry_issues
+    
+    return [results[h] for h in hashes], results, len(pending)
+
+
+def normalize_word(text: str) -> str:
+    """Lowercase and strip diacritics for fuzzy comparison"""
+    text = text.lower().replace('ł', 'l')
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of text, padded so short words still have some"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def find_near_duplicates(words: list) -> list:
+    """Find pairs of similar (but not identical) words using a trigram index"""
+    index = defaultdict(list)
+    pairs = []
+    
+    for i, word in enumerate(words):
+        text = normalize_word(word['word'])
+        grams = trigrams(text)
+        
+        # Only compare against entries sharing enough trigrams
+        shared = Counter(j for gram in grams for j in index[gram])
+        for j, count in shared.items():
+            if count * 2 < len(grams):
+                continue
+            
+            other = normalize_word(words[j]['word'])
+            if other == text:
+                continue
+            
+            ratio = SequenceMatcher(None, text, other).ratio()
+            if ratio >= NEAR_DUPLICATE_RATIO:
+                pairs.append((words[j], word, ratio))
+        
+        for gram in grams:
+            index[gram].append(i)
+    
+    return pairs
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Check and preview words database")
+    parser.add_argument('path', nargs='?', default='words_database.json',
+                        help="words database JSON file")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="recheck all entries, ignoring cached results")
+    args = parser.parse_args()
+    
     print("🇵🇱 Loading words database...\n")
     
-    with open('words_database.json', 'r', encoding='utf-8') as f:
+    with open(args.path, 'r', encoding='utf-8') as f:
         words = json.load(f)
     
     print(f"✅ Total words: {len(words)}\n")
     
+    errors = 0
+    
+    # Malformed entries are reported by per-entry checks below
+    renderable = [w for w in words if is_renderable(w)]
+    
     # Check for duplicates
-    word_texts = [w['word'] for w in words]
+    word_texts = [w['word'] for w in renderable]
     duplicates = [word for word, count in Counter(word_texts).items() if count > 1]
     
     if duplicates:
         print(f"⚠️  Found duplicate words: {duplicates}\n")
+        errors += 1
     else:
         print("✅ No duplicate words found\n")
     
+    # Check for near-duplicates
+    near_duplicates = find_near_duplicates(renderable)
+    
+    if near_duplicates:
+        print("⚠️  Found similar words:")
+        for first, second, ratio in near_duplicates:
+            print(f"   {first.get('id')}. {first['word']} ~ {second.get('id')}. {second['word']} ({ratio:.0%})")
+        print()
+    else:
+        print("✅ No similar words found\n")
+    
     # Check ID sequence
-    ids = [w['id'] for w in words]
+    ids = [w.get('id') if isinstance(w, dict) else None for w in words]
     if ids != list(range(len(words))):
         print("⚠️  IDs are not sequential!\n")
+        errors += 1
+    else:
+        print(f"✅ IDs are sequential (0-{len(words) - 1})\n")
+    
+    # Per-entry checks
+    cache_path = os.path.join(os.path.dirname(os.path.abspath(args.path)), CACHE_FILE)
+    cache = {} if args.no_cache else load_cache(cache_path)
+    
+    entry_issues, results, rechecked = validate_entries(words, cache, args.workers)
+    save_cache(cache_path, results)
+    
+    print(f"🔎 Checked entries: {rechecked} (cached: {len(words) - rechecked})\n")
+    
+    entry_errors = 0
+    entry_warnings = 0
+    for n, (word, issues) in enumerate(zip(words, entry_issues)):
+        label = f"{word.get('id')}. {word.get('word')}" if isinstance(word, dict) else f"#{n}"
+        for level, message in issues:
+            icon = "❌" if level == 'error' else "⚠️ "
+            print(f"{icon} {label}: {message}")
+            if level == 'error':
+                entry_errors += 1
+            else:
+                entry_warnings += 1
+    
+    if entry_errors or entry_warnings:
+        print(f"\nEntry errors: {entry_errors}, warnings: {entry_warnings}\n")
     else:
-        print("✅ IDs are sequential (0-299)\n")
+        print("✅ All entries passed Markdown, length and transcription checks\n")
+    
+    errors += entry_errors
     
     # Show first 5 words
     print("📚 First 5 words:\n")
-    for i in range(min(5, len(words))):
-        word = words[i]
-        print(f"{word['id']}. {word['word']} - {word['translation']}")
+    for i in range(min(5, len(renderable))):
+        word = renderable[i]
+        print(f"{word.get('id')}. {word['word']} - {word['translation']}")
     
     print("\n📚 Last 5 words:\n")
-    for i in range(max(0, len(words)-5), len(words)):
-        word = words[i]
-        print(f"{word['id']}. {word['word']} - {word['translation']}")
+    for i in range(max(0, len(renderable)-5), len(renderable)):
+        word = renderable[i]
+        print(f"{word.get('id')}. {word['word']} - {word['translation']}")
     
     # Statistics
     print("\n📊 Statistics:\n")
     
     # Count words with full descriptions
-    full_descriptions = sum(1 for w in words if len(w.get('description', '')) > 100)
+    full_descriptions = sum(1 for w in renderable if len(w['description']) > 100)
     print(f"Words with full descriptions (>100 chars): {full_descriptions}")
     
     # Count words with examples
-    with_examples = sum(1 for w in words if w.get('examples'))
+    with_examples = sum(1 for w in renderable if w.get('examples'))
     print(f"Words with examples: {with_examples}")
     
     # Count words with fun facts
-    with_facts = sum(1 for w in words if w.get('fun_fact'))
+    with_facts = sum(1 for w in renderable if w.get('fun_fact'))
     print(f"Words with fun facts: {with_facts}")
     
+    # Longest rendered message
+    if renderable:
+        longest = max(renderable, key=lambda w: len(format_word_message(w)))
+        print(f"Longest message: {len(format_word_message(longest))}/{TELEGRAM_MESSAGE_LIMIT} chars ({longest['word']})")
+    
     # Show random word
-    print("\n🎲 Random word preview:\n")
-    import random
-    random_word = random.choice(words)
-    
-    print(f"🇵🇱 Word: {random_word['word']}")
-    print(f"Translation: {random_word['translation']}")
-    print(f"Description: {random_word.get('description', 'N/A')[:100]}...")
-    if random_word.get('examples'):
-        print(f"Example: {random_word['examples'][0]}")
-    if random_word.get('fun_fact'):
-        print(f"Fun fact: {random_word['fun_fact'][:100]}...")
+    if renderable:
+        print("\n🎲 Random word preview:\n")
+        import random
+        random_word = random.choice(renderable)
+        
+        print(f"🇵🇱 Word: {random_word['word']}")
+        print(f"Translation: {random_word['translation']}")
+        print(f"Description: {random_word['description'][:100]}...")
+        if random_word.get('examples'):
+            print(f"Example: {random_word['examples'][0]}")
+        if random_word.get('fun_fact'):
+            print(f"Fun fact: {random_word['fun_fact'][:100]}...")
+    
+    if errors:
+        print(f"\n❌ Database check found {errors} error(s)!")
+        sys.exit(1)
     
     print("\n✅ Database check complete!")
 
 if __name__ == "__main__":
     main()
-
-
-
-
-
-
@@ -4,15 +4,21 @@ Manages user data and word progress
 """
 
 import sqlite3
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import Optional, List
 
 
 class Database:
-    def __init__(self, db_path: str = "polish_bot.db"):
+    def __init__(self, db_path: str = "polish_bot.db", timezone=None):
         self.db_path = db_path
+        # Timestamps and daily stats follow this timezone (server local time if None)
+        self.timezone = timezone
         self.init_database()
     
+    def _now(self) -> datetime:
+        """Current time in the configured timezone, without tzinfo"""
+        return datetime.now(self.timezone).replace(tzinfo=None)
+    
     def get_connection(self):
         """Create database connection"""
         return sqlite3.connect(self.db_path)
@@ -33,34 +39,182 @@ class Database:
             )
         ''')
         
-        # User word history table
+        # Learning cycle counter, bumped every time progress is reset
+        self._ensure_column(cursor, 'users', 'cycle', 'INTEGER DEFAULT 0')
+        
+        # History tables created before cycles existed are rebuilt below
+        cursor.execute('PRAGMA table_info(user_word_history)')
+        history_columns = [row[1] for row in cursor.fetchall()]
+        migrate_history = bool(history_columns) and 'cycle' not in history_columns
+        if migrate_history:
+            cursor.execute('ALTER TABLE user_word_history RENAME TO user_word_history_old')
+        
+        # User word history table (hot data: current cycle only after compaction)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS user_word_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER,
                 word_id INTEGER,
                 sent_at TEXT,
+                cycle INTEGER DEFAULT 0,
                 FOREIGN KEY (user_id) REFERENCES users (user_id),
-                UNIQUE(user_id, word_id)
+                UNIQUE(user_id, cycle, word_id)
+            )
+        ''')
+        
+        if migrate_history:
+            cursor.execute('''
+                INSERT INTO user_word_history (id, user_id, word_id, sent_at, cycle)
+                SELECT id, user_id, word_id, sent_at, 0 FROM user_word_history_old
+            ''')
+            cursor.execute('DROP TABLE user_word_history_old')
+        
+        # Completed cycles packed into one bitset row each
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_word_archive (
+                user_id INTEGER,
+                cycle INTEGER,
+                words BLOB,
+                words_count INTEGER,
+                started_at TEXT,
+                finished_at TEXT,
+                PRIMARY KEY (user_id, cycle)
+            )
+        ''')
+        
+        # Completed cycles still waiting to be moved out of user_word_history
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS history_compaction_queue (
+                user_id INTEGER,
+                cycle INTEGER,
+                finished_at TEXT,
+                PRIMARY KEY (user_id, cycle)
+            )
+        ''')
+        
+        # Per-user counters kept in sync with user_word_history
+        self._ensure_column(cursor, 'users', 'words_learned', 'INTEGER DEFAULT 0')
+        
+        # Delivery tracking for the daily broadcast
+        self._ensure_column(cursor, 'users', 'last_interaction_at', 'TEXT')
+        
+        # Users from before interaction tracking start with a clean slate,
+        # otherwise everyone who signed up long ago would look inactive.
+        # Yesterday, so their first interaction today still counts as active
+        cursor.execute(
+            'UPDATE users SET last_interaction_at = ? WHERE last_interaction_at IS NULL',
+            ((self._now() - timedelta(days=1)).isoformat(),)
+        )
+        
+        self._ensure_column(cursor, 'users', 'failed_deliveries', 'INTEGER DEFAULT 0')
+        self._ensure_column(cursor, 'users', 'blocked', 'INTEGER DEFAULT 0')
+        self._ensure_column(cursor, 'users', 'next_delivery_date', "TEXT DEFAULT ''")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_users_delivery
+            ON users (daily_notifications, next_delivery_date)
+        ''')
+        
+        # Daily words prepared ahead of the morning broadcast
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS delivery_queue (
+                user_id INTEGER PRIMARY KEY,
+                delivery_date TEXT,
+                word_id INTEGER,
+                message TEXT
+            )
+        ''')
+        
+        # Dates for which delivery_queue was fully prepared
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS delivery_runs (
+                delivery_date TEXT PRIMARY KEY,
+                prepared_at TEXT
+            )
+        ''')
+        
+        # Aggregate statistics tables (updated incrementally on every write)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_progress (
+                words_learned INTEGER PRIMARY KEY,
+                users INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_daily (
+                day TEXT PRIMARY KEY,
+                active_users INTEGER NOT NULL DEFAULT 0,
+                words_sent INTEGER NOT NULL DEFAULT 0
             )
         ''')
         
         conn.commit()
+        
+        # Fill summary tables once for databases created before they existed
+        cursor.execute('SELECT 1 FROM stats_counters LIMIT 1')
+        needs_rebuild = cursor.fetchone() is None
         conn.close()
+        
+        if needs_rebuild:
+            self.rebuild_stats()
+    
+    def _ensure_column(self, cursor, table: str, column: str, definition: str):
+        """Add column to an existing table if it is missing"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        columns = [row[1] for row in cursor.fetchall()]
+        
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
+    def _bump_counter(self, cursor, name: str, delta: int = 1):
+        """Add delta to an aggregate counter"""
+        cursor.execute('''
+            INSERT INTO stats_counters (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+        ''', (name, delta))
+    
+    def _move_progress_bucket(self, cursor, old_count: Optional[int], new_count: int):
+        """Move one user between words_learned buckets of the histogram"""
+        if old_count is not None:
+            cursor.execute('''
+                UPDATE stats_progress SET users = users - 1
+                WHERE words_learned = ?
+            ''', (old_count,))
+        
+        cursor.execute('''
+            INSERT INTO stats_progress (words_learned, users) VALUES (?, 1)
+            ON CONFLICT(words_learned) DO UPDATE SET users = users + 1
+        ''', (new_count,))
     
     def add_user(self, user_id: int, username: str = None) -> bool:
         """Add new user or update existing"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        now = self._now().isoformat()
+        
         try:
             cursor.execute('''
-                INSERT OR IGNORE INTO users (user_id, username, created_at)
-                VALUES (?, ?, ?)
-            ''', (user_id, username, datetime.now().isoformat()))
+                INSERT OR IGNORE INTO users (user_id, username, created_at, last_interaction_at)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, username, now, now))
+            
+            is_new = cursor.rowcount > 0
+            if is_new:
+                self._record_active_user(cursor)
+                self._bump_counter(cursor, 'total_users')
+                self._bump_counter(cursor, 'notifications_on')
+                self._move_progress_bucket(cursor, None, 0)
             
             conn.commit()
-            return cursor.rowcount > 0
+            return is_new
         except Exception as e:
             print(f"Error adding user: {e}")
             return False
@@ -86,8 +240,9 @@ class Database:
         cursor.execute('''
             SELECT word_id FROM user_word_history
             WHERE user_id = ?
+              AND cycle = COALESCE((SELECT cycle FROM users WHERE user_id = ?), 0)
             ORDER BY sent_at
-        ''', (user_id,))
+        ''', (user_id, user_id))
         
         word_ids = [row[0] for row in cursor.fetchall()]
         conn.close()
@@ -101,9 +256,12 @@ class Database:
         
         try:
             cursor.execute('''
-                INSERT OR IGNORE INTO user_word_history (user_id, word_id, sent_at)
-                VALUES (?, ?, ?)
-            ''', (user_id, word_id, datetime.now().isoformat()))
+                INSERT OR IGNORE INTO user_word_history (user_id, word_id, sent_at, cycle)
+                VALUES (?, ?, ?, COALESCE((SELECT cycle FROM users WHERE user_id = ?), 0))
+            ''', (user_id, word_id, self._now().isoformat(), user_id))
+            
+            if cursor.rowcount > 0:
+                self._record_word_sent(cursor, user_id)
             
             conn.commit()
             return True
@@ -113,28 +271,88 @@ class Database:
         finally:
             conn.close()
     
+    def _record_word_sent(self, cursor, user_id: int):
+        """Update aggregate statistics after a new history row"""
+        today = self._now().date().isoformat()
+        
+        self._bump_counter(cursor, 'words_sent')
+        cursor.execute('''
+            INSERT INTO stats_daily (day, words_sent) VALUES (?, 1)
+            ON CONFLICT(day) DO UPDATE SET words_sent = words_sent + 1
+        ''', (today,))
+        
+        cursor.execute('SELECT words_learned FROM users WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return
+        
+        words_learned = row[0] or 0
+        cursor.execute(
+            'UPDATE users SET words_learned = ? WHERE user_id = ?',
+            (words_learned + 1, user_id)
+        )
+        self._move_progress_bucket(cursor, words_learned, words_learned + 1)
+    
+    def _record_active_user(self, cursor):
+        """Count user's first interaction of the day in daily statistics"""
+        cursor.execute('''
+            INSERT INTO stats_daily (day, active_users) VALUES (?, 1)
+            ON CONFLICT(day) DO UPDATE SET active_users = active_users + 1
+        ''', (self._now().date().isoformat(),))
+    
     def get_next_word_id(self, user_id: int, total_words: int = 300) -> int:
         """Get next word ID for user (0-299), reset if all sent"""
-        sent_words = self.get_user_sent_words(user_id)
+        if self.reset_if_cycle_complete(user_id, total_words):
+            return 0
+        
+        return self.peek_next_word_id(user_id, total_words)
+    
+    def peek_next_word_id(self, user_id: int, total_words: int = 300) -> int:
+        """Get next word ID for user without changing progress (0 if all sent)"""
+        sent_words = set(self.get_user_sent_words(user_id))
         
-        # If all words sent, reset
         if len(sent_words) >= total_words:
-            self.reset_user_progress(user_id)
             return 0
         
-        # Find first word not sent
         for word_id in range(total_words):
             if word_id not in sent_words:
                 return word_id
         
         return 0
     
+    def reset_if_cycle_complete(self, user_id: int, total_words: int = 300) -> bool:
+        """Start a new cycle if all words were sent. Returns True if progress was reset."""
+        if len(self.get_user_sent_words(user_id)) < total_words:
+            return False
+        
+        self.reset_user_progress(user_id)
+        return True
+    
     def reset_user_progress(self, user_id: int):
-        """Reset user's word progress"""
+        """Reset user's word progress (old cycle is queued for archiving)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('DELETE FROM user_word_history WHERE user_id = ?', (user_id,))
+        cursor.execute('SELECT words_learned, cycle FROM users WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        if row is not None:
+            words_learned, cycle = row[0] or 0, row[1] or 0
+            
+            # Start a new cycle; old rows stay until compact_history() moves them
+            cursor.execute('''
+                UPDATE users SET words_learned = 0, cycle = ?
+                WHERE user_id = ?
+            ''', (cycle + 1, user_id))
+            cursor.execute('''
+                INSERT OR IGNORE INTO history_compaction_queue (user_id, cycle, finished_at)
+                VALUES (?, ?, ?)
+            ''', (user_id, cycle, self._now().isoformat()))
+            
+            self._move_progress_bucket(cursor, words_learned, 0)
+            self._bump_counter(cursor, 'progress_resets')
+        else:
+            cursor.execute('DELETE FROM user_word_history WHERE user_id = ?', (user_id,))
+        
         conn.commit()
         conn.close()
     
@@ -145,12 +363,13 @@ class Database:
         
         cursor.execute('''
             UPDATE users 
-            SET daily_notifications = 1 - daily_notifications
+            SET daily_notifications = 1 - daily_notifications, blocked = 0
             WHERE user_id = ?
         ''', (user_id,))
         
         cursor.execute('SELECT daily_notifications FROM users WHERE user_id = ?', (user_id,))
         new_state = cursor.fetchone()[0]
+        self._bump_counter(cursor, 'notifications_on', 1 if new_state else -1)
         
         conn.commit()
         conn.close()
@@ -179,14 +398,439 @@ class Database:
         conn.close()
         return user_ids
     
+    def count_users_with_notifications(self) -> int:
+        """Count users with notifications enabled"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*) FROM users WHERE daily_notifications = 1')
+        count = cursor.fetchone()[0]
+        
+        conn.close()
+        return count
+    
+    def get_users_due_for_delivery(self, today: str) -> List[tuple]:
+        """
+        Get users whose next daily word is due on or before today (ISO date).
+        Returns list of (user_id, last_interaction_at) tuples.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT user_id, COALESCE(last_interaction_at, created_at) FROM users
+            WHERE daily_notifications = 1 AND next_delivery_date <= ?
+        ''', (today,))
+        users = cursor.fetchall()
+        
+        conn.close()
+        return users
+    
+    def is_user_due_for_delivery(self, user_id: int, today: str) -> bool:
+        """Check if user's next daily word is due on or before today (ISO date)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT 1 FROM users
+            WHERE user_id = ? AND daily_notifications = 1 AND next_delivery_date <= ?
+        ''', (user_id, today))
+        due = cursor.fetchone() is not None
+        
+        conn.close()
+        return due
+    
+    def update_last_interaction(self, user_id: int, today: str) -> bool:
+        """
+        Remember that user interacted with the bot (makes daily words due again).
+        Users disabled because they blocked the bot get notifications back.
+        Returns True if user was on reduced frequency (next word later than
+        tomorrow, relative to today as ISO date) or blocked before.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        now = self._now()
+        
+        cursor.execute('''
+            SELECT next_delivery_date, last_interaction_at, blocked FROM users
+            WHERE user_id = ?
+        ''', (user_id,))
+        row = cursor.fetchone()
+        if row is None:
+            conn.close()
+            return False
+        
+        next_delivery_date, last_interaction_at, blocked = row
+        
+        # First interaction of the day for this user
+        if (last_interaction_at or '')[:10] != now.date().isoformat():
+            self._record_active_user(cursor)
+        
+        if blocked:
+            cursor.execute('''
+                UPDATE users SET daily_notifications = 1, blocked = 0, failed_deliveries = 0
+                WHERE user_id = ?
+            ''', (user_id,))
+            self._bump_counter(cursor, 'notifications_on')
+        
+        cursor.execute('''
+            UPDATE users SET last_interaction_at = ?, next_delivery_date = ''
+            WHERE user_id = ?
+        ''', (now.isoformat(), user_id))
+        
+        conn.commit()
+        conn.close()
+        
+        tomorrow = (date.fromisoformat(today) + timedelta(days=1)).isoformat()
+        return (next_delivery_date or '') > tomorrow or bool(blocked)
+    
+    def record_delivery_success(self, user_id: int, next_delivery_date: str):
+        """Reset failure count and schedule the next daily word"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE users SET failed_deliveries = 0, next_delivery_date = ?
+            WHERE user_id = ?
+        ''', (next_delivery_date, user_id))
+        
+        conn.commit()
+        conn.close()
+    
+    def record_delivery_failure(self, user_id: int, blocked: bool = False) -> int:
+        """
+        Count failed delivery. Users who blocked the bot get notifications disabled
+        until they interact again. Returns failure count.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE users SET failed_deliveries = failed_deliveries + 1
+            WHERE user_id = ?
+        ''', (user_id,))
+        
+        if blocked:
+            cursor.execute('''
+                UPDATE users SET daily_notifications = 0, blocked = 1
+                WHERE user_id = ? AND daily_notifications = 1
+            ''', (user_id,))
+            if cursor.rowcount > 0:
+                self._bump_counter(cursor, 'notifications_on', -1)
+        
+        cursor.execute('SELECT failed_deliveries FROM users WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        
+        conn.commit()
+        conn.close()
+        
+        return row[0] if row else 0
+    
+    def replace_delivery_queue(self, delivery_date: str, entries: List[tuple]):
+        """Replace the whole delivery queue with (user_id, word_id, message) entries"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM delivery_queue')
+        cursor.executemany('''
+            INSERT INTO delivery_queue (user_id, delivery_date, word_id, message)
+            VALUES (?, ?, ?, ?)
+        ''', [(user_id, delivery_date, word_id, message) for user_id, word_id, message in entries])
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO delivery_runs (delivery_date, prepared_at)
+            VALUES (?, ?)
+        ''', (delivery_date, self._now().isoformat()))
+        
+        conn.commit()
+        conn.close()
+    
+    def is_delivery_queue_prepared(self, delivery_date: str) -> bool:
+        """Check if delivery queue was prepared for the date"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT 1 FROM delivery_runs WHERE delivery_date = ?', (delivery_date,))
+        prepared = cursor.fetchone() is not None
+        
+        conn.close()
+        return prepared
+    
+    def set_delivery_queue_entry(self, user_id: int, delivery_date: str, word_id: int, message: str):
+        """Add or replace a single user's queued word"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO delivery_queue (user_id, delivery_date, word_id, message)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, delivery_date, word_id, message))
+        
+        conn.commit()
+        conn.close()
+    
+    def remove_delivery_queue_entry(self, user_id: int):
+        """Remove user's queued word (sent, blocked or no longer due)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM delivery_queue WHERE user_id = ?', (user_id,))
+        
+        conn.commit()
+        conn.close()
+    
+    def count_delivery_queue(self, delivery_date: str) -> int:
+        """Count queued words for the date (users with notifications enabled only)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*) FROM delivery_queue q
+            JOIN users u ON u.user_id = q.user_id
+            WHERE q.delivery_date = ? AND u.daily_notifications = 1
+        ''', (delivery_date,))
+        count = cursor.fetchone()[0]
+        
+        conn.close()
+        return count
+    
+    def get_delivery_queue_batch(self, delivery_date: str, after_user_id: int = 0,
+                                 limit: int = 500) -> List[tuple]:
+        """
+        Get next batch of queued words ordered by user ID.
+        Returns list of (user_id, word_id, message, last_interaction_at) tuples.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT q.user_id, q.word_id, q.message,
+                   COALESCE(u.last_interaction_at, u.created_at)
+            FROM delivery_queue q
+            JOIN users u ON u.user_id = q.user_id
+            WHERE q.delivery_date = ? AND q.user_id > ? AND u.daily_notifications = 1
+            ORDER BY q.user_id
+            LIMIT ?
+        ''', (delivery_date, after_user_id, limit))
+        batch = cursor.fetchall()
+        
+        conn.close()
+        return batch
+    
     def get_user_progress(self, user_id: int, total_words: int = 300) -> dict:
         """Get user's learning progress"""
         sent_words = self.get_user_sent_words(user_id)
+        archive = self.get_user_archive(user_id)
         
         return {
             'words_learned': len(sent_words),
             'total_words': total_words,
-            'percentage': round((len(sent_words) / total_words) * 100, 1)
+            'percentage': round((len(sent_words) / total_words) * 100, 1),
+            'previous_cycles': len(archive),
+            'previous_cycles_words': sum(cycle['words_count'] for cycle in archive)
+        }
+    
+    @staticmethod
+    def _pack_word_ids(word_ids: List[int]) -> bytes:
+        """Pack word IDs into a bitset (bit N set = word N was sent)"""
+        bits = bytearray(max(word_ids) // 8 + 1 if word_ids else 0)
+        for word_id in word_ids:
+            bits[word_id // 8] |= 1 << (word_id % 8)
+        return bytes(bits)
+    
+    @staticmethod
+    def _unpack_word_ids(bits: bytes) -> List[int]:
+        """Unpack bitset produced by _pack_word_ids"""
+        return [
+            i * 8 + bit
+            for i, byte in enumerate(bits)
+            for bit in range(8)
+            if byte & (1 << bit)
+        ]
+    
+    def _compact_cycle(self, cursor, user_id: int, cycle: int, finished_at: str):
+        """Move one completed cycle from user_word_history into the archive"""
+        cursor.execute('''
+            SELECT word_id, sent_at FROM user_word_history
+            WHERE user_id = ? AND cycle = ?
+        ''', (user_id, cycle))
+        rows = cursor.fetchall()
+        
+        if rows:
+            word_ids = [row[0] for row in rows]
+            cursor.execute('''
+                INSERT OR REPLACE INTO user_word_archive
+                    (user_id, cycle, words, words_count, started_at, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, cycle, self._pack_word_ids(word_ids), len(word_ids),
+                  min(row[1] for row in rows), finished_at))
+            
+            cursor.execute(
+                'DELETE FROM user_word_history WHERE user_id = ? AND cycle = ?',
+                (user_id, cycle)
+            )
+        
+        cursor.execute(
+            'DELETE FROM history_compaction_queue WHERE user_id = ? AND cycle = ?',
+            (user_id, cycle)
+        )
+    
+    def compact_history(self, batch_size: int = 50) -> int:
+        """Archive up to batch_size completed cycles. Returns number archived."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT user_id, cycle, finished_at FROM history_compaction_queue
+            ORDER BY finished_at
+            LIMIT ?
+        ''', (batch_size,))
+        
+        batch = cursor.fetchall()
+        for user_id, cycle, finished_at in batch:
+            self._compact_cycle(cursor, user_id, cycle, finished_at)
+        
+        conn.commit()
+        conn.close()
+        
+        return len(batch)
+    
+    def get_user_archive(self, user_id: int) -> List[dict]:
+        """Get user's completed cycles (oldest first), including ones not yet compacted"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT cycle, words_count, started_at, finished_at FROM user_word_archive
+            WHERE user_id = ?
+            UNION ALL
+            SELECT q.cycle, COUNT(h.word_id), MIN(h.sent_at), q.finished_at
+            FROM history_compaction_queue q
+            JOIN user_word_history h ON h.user_id = q.user_id AND h.cycle = q.cycle
+            WHERE q.user_id = ?
+            GROUP BY q.cycle
+            ORDER BY cycle
+        ''', (user_id, user_id))
+        
+        cycles = [
+            {
+                'cycle': row[0],
+                'words_count': row[1],
+                'started_at': row[2],
+                'finished_at': row[3]
+            }
+            for row in cursor.fetchall()
+        ]
+        conn.close()
+        
+        return cycles
+    
+    def get_archived_word_ids(self, user_id: int, cycle: int) -> List[int]:
+        """Get word IDs sent to user during a completed cycle"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            'SELECT words FROM user_word_archive WHERE user_id = ? AND cycle = ?',
+            (user_id, cycle)
+        )
+        row = cursor.fetchone()
+        
+        if row:
+            word_ids = self._unpack_word_ids(row[0])
+        else:
+            # Cycle may still be waiting for compaction
+            cursor.execute('''
+                SELECT h.word_id FROM user_word_history h
+                JOIN history_compaction_queue q ON q.user_id = h.user_id AND q.cycle = h.cycle
+                WHERE h.user_id = ? AND h.cycle = ?
+                ORDER BY h.word_id
+            ''', (user_id, cycle))
+            word_ids = [r[0] for r in cursor.fetchall()]
+        
+        conn.close()
+        return word_ids
+    
+    def rebuild_stats(self):
+        """Recompute aggregate statistics from users and history (full table scan)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE users SET
+                words_learned = (
+                    SELECT COUNT(*) FROM user_word_history h
+                    WHERE h.user_id = users.user_id AND h.cycle = users.cycle
+                )
+        ''')
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO stats_counters (name, value)
+            SELECT 'total_users', COUNT(*) FROM users
+            UNION ALL
+            SELECT 'notifications_on', COUNT(*) FROM users WHERE daily_notifications = 1
+        ''')
+        
+        cursor.execute('DELETE FROM stats_progress')
+        cursor.execute('''
+            INSERT INTO stats_progress (words_learned, users)
+            SELECT words_learned, COUNT(*) FROM users GROUP BY words_learned
+        ''')
+        
+        # Cumulative totals outlive deleted history, so only backfill missing ones
+        cursor.execute('''
+            INSERT OR IGNORE INTO stats_counters (name, value)
+            SELECT 'words_sent', COUNT(*) FROM user_word_history
+            UNION ALL
+            SELECT 'progress_resets', 0
+        ''')
+        # History only records sends, so past days get no active user count
+        cursor.execute('''
+            INSERT OR IGNORE INTO stats_daily (day, words_sent)
+            SELECT substr(sent_at, 1, 10), COUNT(*)
+            FROM user_word_history
+            GROUP BY substr(sent_at, 1, 10)
+        ''')
+        
+        conn.commit()
+        conn.close()
+    
+    def get_global_stats(self, total_words: int = 300, buckets: int = 5) -> dict:
+        """Get aggregate statistics from the summary tables"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT name, value FROM stats_counters')
+        counters = dict(cursor.fetchall())
+        
+        cursor.execute(
+            'SELECT active_users, words_sent FROM stats_daily WHERE day = ?',
+            (self._now().date().isoformat(),)
+        )
+        today = cursor.fetchone() or (0, 0)
+        
+        # Histogram has at most total_words + 1 rows regardless of user count
+        cursor.execute('SELECT words_learned, users FROM stats_progress WHERE users > 0')
+        distribution = [0] * buckets
+        for words_learned, users in cursor.fetchall():
+            bucket = min(words_learned * buckets // max(total_words, 1), buckets - 1)
+            distribution[bucket] += users
+        
+        conn.close()
+        
+        total_users = counters.get('total_users', 0)
+        notifications_on = counters.get('notifications_on', 0)
+        
+        return {
+            'total_users': total_users,
+            'notifications_on': notifications_on,
+            'notifications_off': total_users - notifications_on,
+            'active_today': today[0],
+            'words_sent_today': today[1],
+            'words_sent_total': counters.get('words_sent', 0),
+            'progress_resets': counters.get('progress_resets', 0),
+            'completion_distribution': distribution
         }
 
 
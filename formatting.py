@@ -0,0 +1,30 @@
+"""
+Message formatting for Learning Polish Bot
+Renders word entries into Telegram messages
+"""
+
+# Telegram rejects messages longer than this (in characters)
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def format_word_message(word_data: dict) -> str:
+    """Format word data into a beautiful message"""
+    message = f"🇵🇱 **Слово дня — {word_data['word'].upper()}**\n\n"
+    
+    # Add transcription if available
+    if word_data.get('transcription'):
+        message += f"🔊 **Произношение:** [{word_data['transcription']}]\n\n"
+    
+    message += f"**Перевод:** {word_data['translation']}\n\n"
+    message += f"**Описание:**\n{word_data['description']}\n\n"
+    
+    if word_data.get('examples'):
+        message += "**Примеры использования:**\n"
+        for example in word_data['examples']:
+            message += f"• {example}\n"
+        message += "\n"
+    
+    if word_data.get('fun_fact'):
+        message += f"**Интересный факт:**\n{word_data['fun_fact']}"
+    
+    return message
@@ -6,8 +6,10 @@ A bot to help users learn Polish language - 300 words with daily notifications
 import os
 import sys
 import json
+import asyncio
 import logging
-from datetime import time
+from datetime import time, date, datetime, timedelta
+from typing import Optional
 from dotenv import load_dotenv
 
 # Get the directory where this script is located
@@ -17,18 +19,21 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ChatMember
 from telegram.ext import (
     Application,
     CommandHandler,
     CallbackQueryHandler,
+    TypeHandler,
     ContextTypes
 )
+from telegram.error import Forbidden
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 import pytz
 
 from database import Database
+from formatting import format_word_message
 
 # Load environment variables from the script directory
 load_dotenv(os.path.join(BASE_DIR, '.env'))
@@ -40,9 +45,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Daily jobs and stats run on Warsaw time, whatever the server clock is set to
+SCHEDULE_TIMEZONE = pytz.timezone('Europe/Warsaw')
+
 # Initialize database with absolute path
 db_path = os.path.join(BASE_DIR, 'polish_bot.db')
-db = Database(db_path)
+db = Database(db_path, SCHEDULE_TIMEZONE)
 
 # Load words database
 words_db_path = os.path.join(BASE_DIR, 'words_database.json')
@@ -51,28 +59,19 @@ with open(words_db_path, 'r', encoding='utf-8') as f:
 
 TOTAL_WORDS = len(WORDS_DATABASE)
 
+# Queue entries prepared or sent between yields to the event loop
+DELIVERY_QUEUE_BATCH = 500
 
-def format_word_message(word_data: dict) -> str:
-    """Format word data into a beautiful message"""
-    message = f"🇵🇱 **Слово дня — {word_data['word'].upper()}**\n\n"
-    
-    # Add transcription if available
-    if word_data.get('transcription'):
-        message += f"🔊 **Произношение:** [{word_data['transcription']}]\n\n"
-    
-    message += f"**Перевод:** {word_data['translation']}\n\n"
-    message += f"**Описание:**\n{word_data['description']}\n\n"
-    
-    if word_data.get('examples'):
-        message += "**Примеры использования:**\n"
-        for example in word_data['examples']:
-            message += f"• {example}\n"
-        message += "\n"
-    
-    if word_data.get('fun_fact'):
-        message += f"**Интересный факт:**\n{word_data['fun_fact']}"
-    
-    return message
+# Completed cycles archived per database transaction by the compaction job
+HISTORY_COMPACTION_BATCH = 50
+
+# Users inactive for at least N days get a word every M days: (N, M), longest first
+INACTIVE_SEND_INTERVALS = [(60, 7), (14, 3)]
+
+# Telegram user IDs allowed to use admin commands (comma-separated in .env)
+ADMIN_USER_IDS = {
+    int(uid) for uid in os.getenv('ADMIN_USER_IDS', '').split(',') if uid.strip()
+}
 
 
 def get_main_keyboard(user_id: int) -> InlineKeyboardMarkup:
@@ -100,6 +99,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     is_new = db.add_user(user_id, username)
     
     if is_new:
+        refresh_queue_entry(user_id)
         welcome_text = (
             f"Привет, {user.first_name}! 👋\n\n"
             "Добро пожаловать в **Learning Polish Bot**! 🇵🇱\n\n"
@@ -175,6 +175,9 @@ async def send_next_word(user_id: int, context: ContextTypes.DEFAULT_TYPE):
     # Add to history
     db.add_word_to_history(user_id, word_id)
     
+    # Morning word was picked before this one
+    refresh_queue_entry(user_id)
+    
     return word_data['word']
 
 
@@ -211,6 +214,12 @@ async def progress_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"Прогресс: **{progress['percentage']}%**\n\n"
     )
     
+    if progress['previous_cycles']:
+        progress_text += (
+            f"Предыдущих циклов: **{progress['previous_cycles']}** "
+            f"(слов в них: **{progress['previous_cycles_words']}**)\n\n"
+        )
+    
     if progress['words_learned'] == 0:
         progress_text += "Ты ещё не начал изучение! Нажми кнопку ниже, чтобы получить первое слово. 👇"
     elif progress['words_learned'] == TOTAL_WORDS:
@@ -242,6 +251,7 @@ async def restart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     db.reset_user_progress(user_id)
+    refresh_queue_entry(user_id)
     
     await update.message.reply_text(
         "✅ Твой прогресс сброшен!\n\n"
@@ -250,6 +260,35 @@ async def restart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /stats command - aggregate bot statistics (admins only)"""
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        return
+    
+    stats = db.get_global_stats(TOTAL_WORDS)
+    
+    buckets = len(stats['completion_distribution'])
+    distribution_lines = ""
+    for i, users in enumerate(stats['completion_distribution']):
+        low = i * 100 // buckets
+        high = (i + 1) * 100 // buckets
+        distribution_lines += f"• {low}–{high}%: {users}\n"
+    
+    stats_text = (
+        f"📈 **Статистика бота**\n\n"
+        f"Пользователей: **{stats['total_users']}**\n"
+        f"Уведомления ВКЛ/ВЫКЛ: **{stats['notifications_on']} / {stats['notifications_off']}**\n"
+        f"Активны сегодня: **{stats['active_today']}**\n"
+        f"Слов отправлено сегодня: **{stats['words_sent_today']}**\n"
+        f"Слов отправлено всего: **{stats['words_sent_total']}**\n"
+        f"Сбросов прогресса: **{stats['progress_resets']}**\n\n"
+        f"**Распределение прогресса:**\n"
+        f"{distribution_lines}"
+    )
+    
+    await update.message.reply_text(stats_text, parse_mode='Markdown')
+
+
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button callbacks"""
     query = update.callback_query
@@ -269,6 +308,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif query.data == "toggle_notifications":
         new_state = db.toggle_notifications(user_id)
+        refresh_queue_entry(user_id)
         status = "включены ✅" if new_state else "выключены ❌"
         
         await query.message.reply_text(
@@ -284,38 +324,173 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await help_command(update, context)
 
 
+def get_delivery_date() -> date:
+    """Today's date in the schedule timezone, shared by queue preparation and sending"""
+    return datetime.now(SCHEDULE_TIMEZONE).date()
+
+
+async def track_interaction(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Record last interaction time for every incoming update"""
+    if not update.effective_user:
+        return
+    
+    # Blocking the bot is not an interaction, unblocking is
+    chat_member = update.my_chat_member
+    if chat_member and chat_member.new_chat_member.status != ChatMember.MEMBER:
+        return
+    
+    user_id = update.effective_user.id
+    
+    # Users on reduced frequency or returning after a block become due again
+    if db.update_last_interaction(user_id, get_delivery_date().isoformat()):
+        refresh_queue_entry(user_id)
+
+
+def get_delivery_interval(last_interaction: Optional[str], today: date) -> int:
+    """Days until the next daily word, based on how long the user has been inactive"""
+    if not last_interaction:
+        return 1
+    
+    inactive_days = (today - datetime.fromisoformat(last_interaction).date()).days
+    for min_inactive_days, interval in INACTIVE_SEND_INTERVALS:
+        if inactive_days >= min_inactive_days:
+            return interval
+    
+    return 1
+
+
+def prepare_queue_entry(user_id: int) -> tuple:
+    """Pick and render user's next word. Returns (user_id, word_id, message)."""
+    # Progress is only reset when the word is actually delivered
+    word_id = db.peek_next_word_id(user_id, TOTAL_WORDS)
+    return user_id, word_id, format_word_message(WORDS_DATABASE[word_id])
+
+
+# Users whose state changed while prepare_daily_queue was running
+queue_build_changes: Optional[set] = None
+
+
+def refresh_queue_entry(user_id: int):
+    """Update one user's entry in today's delivery queue after their state changed"""
+    # Queue being built: entry may already be stale, refresh it once the build is saved
+    if queue_build_changes is not None:
+        queue_build_changes.add(user_id)
+        return
+    
+    today = get_delivery_date().isoformat()
+    
+    # Queue not built yet: preparation will pick up the current state
+    if not db.is_delivery_queue_prepared(today):
+        return
+    
+    if db.is_user_due_for_delivery(user_id, today):
+        _, word_id, message = prepare_queue_entry(user_id)
+        db.set_delivery_queue_entry(user_id, today, word_id, message)
+    else:
+        db.remove_delivery_queue_entry(user_id)
+
+
+async def prepare_daily_queue():
+    """Pick and render today's words for all due users ahead of the broadcast"""
+    global queue_build_changes
+    
+    today = get_delivery_date().isoformat()
+    users = db.get_users_due_for_delivery(today)
+    entries = []
+    queue_build_changes = set()
+    
+    try:
+        for n, (user_id, _) in enumerate(users, 1):
+            entries.append(prepare_queue_entry(user_id))
+            
+            # Let the bot handle updates between batches
+            if n % DELIVERY_QUEUE_BATCH == 0:
+                await asyncio.sleep(0)
+        
+        db.replace_delivery_queue(today, entries)
+    finally:
+        changed_user_ids, queue_build_changes = queue_build_changes, None
+    
+    # Apply changes that happened while the queue was being built
+    for user_id in changed_user_ids:
+        refresh_queue_entry(user_id)
+    
+    logger.info(f"Delivery queue prepared for {today}: {len(entries)} words")
+
+
 async def send_daily_words(application):
-    """Send daily words to all users with notifications enabled"""
+    """Send today's prepared words from the delivery queue"""
     logger.info("Starting daily word distribution...")
     
-    users = db.get_all_users_with_notifications()
+    today = get_delivery_date()
+    
+    if not db.is_delivery_queue_prepared(today.isoformat()):
+        logger.warning("Delivery queue was not prepared in advance, preparing now...")
+        await prepare_daily_queue()
+    
+    queued_count = db.count_delivery_queue(today.isoformat())
+    skipped_count = db.count_users_with_notifications() - queued_count
     success_count = 0
+    blocked_count = 0
+    last_user_id = 0
     
-    for user_id in users:
-        try:
-            # Get next word ID
-            word_id = db.get_next_word_id(user_id, TOTAL_WORDS)
-            
-            # Get word data
-            word_data = WORDS_DATABASE[word_id]
-            
-            # Format message
-            message = format_word_message(word_data)
-            
-            # Send message directly using bot
-            await application.bot.send_message(
-                chat_id=user_id,
-                text=message,
-                parse_mode='Markdown'
-            )
+    while True:
+        batch = db.get_delivery_queue_batch(today.isoformat(), last_user_id, DELIVERY_QUEUE_BATCH)
+        if not batch:
+            break
+        
+        for user_id, word_id, message, last_interaction in batch:
+            last_user_id = user_id
             
-            # Add to history
-            db.add_word_to_history(user_id, word_id)
-            success_count += 1
-        except Exception as e:
-            logger.error(f"Failed to send word to user {user_id}: {e}")
+            try:
+                # Send message directly using bot
+                await application.bot.send_message(
+                    chat_id=user_id,
+                    text=message,
+                    parse_mode='Markdown'
+                )
+                
+                # Queued word 0 after a full cycle starts the next one
+                db.reset_if_cycle_complete(user_id, TOTAL_WORDS)
+                
+                # Add to history
+                db.add_word_to_history(user_id, word_id)
+                
+                interval = get_delivery_interval(last_interaction, today)
+                db.record_delivery_success(user_id, (today + timedelta(days=interval)).isoformat())
+                db.remove_delivery_queue_entry(user_id)
+                success_count += 1
+            except Forbidden:
+                # User blocked the bot: stop sending until they come back
+                db.record_delivery_failure(user_id, blocked=True)
+                db.remove_delivery_queue_entry(user_id)
+                blocked_count += 1
+            except Exception as e:
+                failures = db.record_delivery_failure(user_id)
+                logger.error(f"Failed to send word to user {user_id} (failure #{failures}): {e}")
+    
+    logger.info(f"Daily words sent to {success_count}/{queued_count} queued users")
+    logger.info(
+        f"Sends saved: {skipped_count} users not due today, "
+        f"{blocked_count} blocked users disabled for future runs"
+    )
+
+
+async def compact_history():
+    """Move completed learning cycles out of the hot history table in small batches"""
+    archived = 0
+    
+    while True:
+        batch = db.compact_history(batch_size=HISTORY_COMPACTION_BATCH)
+        archived += batch
+        if batch < HISTORY_COMPACTION_BATCH:
+            break
+        
+        # Let the bot handle updates between batches
+        await asyncio.sleep(0)
     
-    logger.info(f"Daily words sent to {success_count}/{len(users)} users")
+    if archived:
+        logger.info(f"Archived {archived} completed learning cycles")
 
 
 def main():
@@ -329,18 +504,22 @@ def main():
     # Create application
     application = Application.builder().token(token).build()
     
+    # Track interactions before any other handler runs
+    application.add_handler(TypeHandler(Update, track_interaction), group=-1)
+    
     # Add command handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("word", word_command))
     application.add_handler(CommandHandler("progress", progress_command))
     application.add_handler(CommandHandler("restart", restart_command))
+    application.add_handler(CommandHandler("stats", stats_command))
     
     # Add callback query handler
     application.add_handler(CallbackQueryHandler(button_callback))
     
     # Set up scheduler for daily messages (9:00 AM Warsaw time)
-    scheduler = AsyncIOScheduler(timezone=pytz.timezone('Europe/Warsaw'))
+    scheduler = AsyncIOScheduler(timezone=SCHEDULE_TIMEZONE)
     scheduler.add_job(
         send_daily_words,
         trigger=CronTrigger(hour=9, minute=0),
@@ -350,6 +529,24 @@ def main():
         replace_existing=True
     )
     
+    # Prepare the morning queue during quiet hours
+    scheduler.add_job(
+        prepare_daily_queue,
+        trigger=CronTrigger(hour=4, minute=0),
+        id='prepare_daily_queue',
+        name='Prepare daily word queue',
+        replace_existing=True
+    )
+    
+    # Archive completed cycles every hour
+    scheduler.add_job(
+        compact_history,
+        trigger=CronTrigger(minute=30),
+        id='compact_history',
+        name='Archive completed learning cycles',
+        replace_existing=True
+    )
+    
     # Start scheduler
     scheduler.start()
     